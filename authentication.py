@@ -5,13 +5,18 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
 from cryptography.fernet import Fernet
 import bcrypt
-from config import settings
+from config import get_settings
+from functools import lru_cache
 import random
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 bearer_scheme = HTTPBearer()
 
-fernet = Fernet(settings.FERNET_ENCRYPTION_KEY)
+
+# Built on first use so importing this module doesn't require the encryption key
+@lru_cache
+def get_fernet() -> Fernet:
+    return Fernet(get_settings().FERNET_ENCRYPTION_KEY)
 
 
 def generate_verification_code():
@@ -19,12 +24,12 @@ def generate_verification_code():
 
 
 def encrypt_email(email: str) -> str:
-    encrypted_email = fernet.encrypt(email.encode())
+    encrypted_email = get_fernet().encrypt(email.encode())
     return encrypted_email.decode()
 
 
 def decrypt_email(encrypted_email: str) -> str:
-    decrypted_email = fernet.decrypt(encrypted_email.encode())
+    decrypted_email = get_fernet().decrypt(encrypted_email.encode())
     return decrypted_email.decode()
 
 
@@ -35,11 +40,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(days=365)  # Long-lived token
     to_encode.update({"exp": expire})
+    settings = get_settings()
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
 
 def decode_access_token(token: str):
+    settings = get_settings()
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         return payload
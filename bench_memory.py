@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from config import get_settings
+from database import create_database_and_tables, create_user_in_database, get_database_connection, \
+    get_formatted_workout_data, get_user_from_database, save_workout_log
+from main import SessionState
+
+# Measures what the server actually holds for a user, before and after the switch to slotted records:
+#   1. peak memory while building the workout history prompt (get_formatted_workout_data), against a
+#      temporary database seeded with that many workouts
+#   2. state retained per warm user between requests: the session_data entry and the timeout middleware's
+#      last-activity timestamp (the formatted history itself is not kept once the prompt has been sent)
+# Uses the settings from .env / the environment, except DATABASE_PATH:
+#   python bench_memory.py
+
+WORKOUT_COUNTS = (200, 2000)
+WARM_USERS = 10000
+EMAIL = "bench@example.com"
+
+
+# The previous implementation: fetchall(), a dict per row and a list of formatted lines
+def formatted_workout_data_before(user_id: int) -> str:
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    cursor.execute("""
+    SELECT date, exercise, reps, duration, additional_details
+    FROM workouts
+    WHERE user_id = ?
+    """, (user_id,))
+    workouts = cursor.fetchall()
+    connection.close()
+    workouts = [
+        {
+            "date": workout[0],
+            "exercise": workout[1],
+            "reps": workout[2],
+            "duration": workout[3],
+            "additional_details": workout[4],
+        }
+        for workout in workouts
+    ]
+    return "Here is the user's workout data: \n" + "\n".join(
+        [
+            f"{workout['date']} - {workout['exercise']} for {workout['reps']} reps, "
+            f"duration: {workout['duration']} mins. "
+            f"Notes: {workout['additional_details']}"
+            for workout in workouts
+        ]
+    )
+
+
+def peak_bytes(function, *args) -> int:
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def seed_workouts(count: int) -> int:
+    connection = sqlite3.connect(get_settings().DATABASE_PATH)
+    connection.execute("DELETE FROM workouts")
+    connection.commit()
+    connection.close()
+    user_id = get_user_from_database(EMAIL)["user_id"]
+    save_workout_log(user_id, (
+        {"date": "2024-06-01", "exercise": f"Exercise {i % 20}", "reps": 10, "duration": 30,
+         "additional_details": "Felt strong, kept good form on every set"}
+        for i in range(count)
+    ))
+    return user_id
+
+
+def retained_bytes_per_user(build) -> float:
+    emails = [f"user{i}@example.com" for i in range(WARM_USERS)]
+    session_data, last_active = {}, {}
+    tracemalloc.start()
+    for email in emails:
+        session_data[email], last_active[email] = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / WARM_USERS
+
+
+def report(label: str, before: float, after: float):
+    print(f"  {label:<28} {before:10.0f} B -> {after:10.0f} B  ({(1 - after / before) * 100:5.1f}% less)")
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_PATH"] = os.path.join(directory, "bench.db")
+        get_settings.cache_clear()
+        create_database_and_tables()
+        create_user_in_database(EMAIL, "hashed-password")
+
+        print("Peak memory building the workout history prompt:")
+        for count in WORKOUT_COUNTS:
+            user_id = seed_workouts(count)
+            assert formatted_workout_data_before(user_id) == get_formatted_workout_data(user_id)
+            report(f"{count} workouts", peak_bytes(formatted_workout_data_before, user_id),
+                   peak_bytes(get_formatted_workout_data, user_id))
+
+    print("State retained per warm user:")
+    report("session entry + timestamp",
+           retained_bytes_per_user(lambda: ({"initial_context_set": True}, datetime.utcnow())),
+           retained_bytes_per_user(lambda: (SessionState(initial_context_set=True), time.monotonic())))
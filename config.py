@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 
 
@@ -17,4 +19,7 @@ class Settings(BaseSettings):
         env_file = ".env"
 
 
-settings = Settings()
+# Settings are read from the environment on first use rather than at import time
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
@@ -1,10 +1,24 @@
 import sqlite3
-from config import settings
-from datetime import datetime, timedelta
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+from config import get_settings
+
+VERIFICATION_CODE_TTL_SECONDS = 30 * 60
+
+
+# Slotted record for a single workout row; much smaller than a per-row dict
+@dataclass(slots=True)
+class WorkoutRecord:
+    date: str
+    exercise: str
+    reps: Optional[int]
+    duration: Optional[int]
+    additional_details: Optional[str]
 
 
 def get_database_connection():
-    connection = sqlite3.connect(settings.DATABASE_PATH)
+    connection = sqlite3.connect(get_settings().DATABASE_PATH)
     return connection
 
 
@@ -21,9 +35,11 @@ def create_database_and_tables():
         age INTEGER,
         gender VARCHAR(100),
         goals TEXT,
-        verified BOOLEAN NOT NULL DEFAULT 0
+        verified BOOLEAN NOT NULL DEFAULT 0,
+        data_version INTEGER NOT NULL DEFAULT 0
     )
     """)
+    migrate_users_table(cursor)
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS workouts (
         workout_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -36,22 +52,62 @@ def create_database_and_tables():
         FOREIGN KEY (user_id) REFERENCES users(user_id)
     )
     """)
+    migrate_verification_codes_table(cursor)
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS verification_codes (
-        email VARCHAR(255) NOT NULL,
+        email VARCHAR(255) PRIMARY KEY,
         code VARCHAR(6) NOT NULL,
-        expiration TIMESTAMP NOT NULL,
+        expiration INTEGER NOT NULL,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     """)
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_verification_codes_expiration ON verification_codes (expiration)
+    """)
     connection.commit()
     connection.close()
 
 
+def migrate_users_table(cursor):
+    # data_version is bumped on every write to a user's profile or workouts; the read endpoints build their ETags
+    # from it. It lives in the database so that every worker sees the same version.
+    columns = cursor.execute("PRAGMA table_info(users)").fetchall()
+    if not any(column[1] == "data_version" for column in columns):
+        cursor.execute("ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0")
+
+
+def migrate_verification_codes_table(cursor):
+    # Older databases keep one row per /register attempt with string timestamps. Rebuild the table keyed by
+    # email with Unix-time expirations, keeping only each email's latest code that is still valid.
+    columns = cursor.execute("PRAGMA table_info(verification_codes)").fetchall()
+    if not columns or any(column[1] == "email" and column[5] for column in columns):
+        return
+    cursor.execute("ALTER TABLE verification_codes RENAME TO verification_codes_old")
+    cursor.execute("""
+    CREATE TABLE verification_codes (
+        email VARCHAR(255) PRIMARY KEY,
+        code VARCHAR(6) NOT NULL,
+        expiration INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cursor.execute("""
+    INSERT OR REPLACE INTO verification_codes (email, code, expiration, created_at)
+    SELECT email, code, CAST(strftime('%s', expiration, 'utc') AS INTEGER), created_at
+    FROM verification_codes_old
+    WHERE CAST(strftime('%s', expiration, 'utc') AS INTEGER) > CAST(strftime('%s', 'now') AS INTEGER)
+    ORDER BY created_at
+    """)
+    cursor.execute("DROP TABLE verification_codes_old")
+
+
 def get_user_from_database(email: str):
     connection = get_database_connection()
     cursor = connection.cursor()
-    cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
+    cursor.execute("""
+    SELECT user_id, email, hashed_password, height, weight, age, gender, goals, verified, data_version
+    FROM users WHERE email = ?
+    """, (email,))
     user = cursor.fetchone()
     connection.close()
     if user:
@@ -65,10 +121,22 @@ def get_user_from_database(email: str):
             "gender": user[6],
             "goals": user[7],
             "verified": user[8],
+            "data_version": user[9],
         }
     return None
 
 
+def get_user_data_version(email: str) -> Optional[int]:
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT data_version FROM users WHERE email = ?", (email,))
+    result = cursor.fetchone()
+    connection.close()
+    if result:
+        return result[0]
+    return None
+
+
 def create_user_in_database(email: str, hashed_password: str):
     connection = get_database_connection()
     cursor = connection.cursor()
@@ -82,12 +150,26 @@ def create_user_in_database(email: str, hashed_password: str):
         connection.close()
 
 
+def update_unverified_user_password(email: str, hashed_password: str):
+    connection = get_database_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+        UPDATE users
+        SET hashed_password = ?
+        WHERE email = ? AND verified = 0
+        """, (hashed_password, email))
+        connection.commit()
+    finally:
+        connection.close()
+
+
 def update_user_details(email: str, height: int, weight: int, age: int, gender: str, goals: str):
     connection = get_database_connection()
     cursor = connection.cursor()
     cursor.execute("""
     UPDATE users
-    SET height = ?, weight = ?, age = ?, gender = ?, goals = ?
+    SET height = ?, weight = ?, age = ?, gender = ?, goals = ?, data_version = data_version + 1
     WHERE email = ?
     """, (height, weight, age, gender, goals, email))
     connection.commit()
@@ -97,11 +179,16 @@ def update_user_details(email: str, height: int, weight: int, age: int, gender:
 def save_verification_code(email, code):
     connection = get_database_connection()
     cursor = connection.cursor()
-    expiration = datetime.now() + timedelta(minutes=30)  # Set expiration time
+    expiration = int(time.time()) + VERIFICATION_CODE_TTL_SECONDS
+    # One row per email: registering again before verifying replaces the pending code instead of appending
     cursor.execute("""
     INSERT INTO verification_codes (email, code, created_at, expiration)
     VALUES (?, ?, CURRENT_TIMESTAMP, ?)
-    """, (email, code, expiration.strftime("%Y-%m-%d %H:%M:%S")))
+    ON CONFLICT (email) DO UPDATE SET
+        code = excluded.code,
+        created_at = excluded.created_at,
+        expiration = excluded.expiration
+    """, (email, code, expiration))
     connection.commit()
     connection.close()
 
@@ -110,80 +197,116 @@ def get_verification_code(email: str):
     connection = get_database_connection()
     cursor = connection.cursor()
     cursor.execute("""
-        SELECT code, created_at, expiration FROM verification_codes WHERE email = ? ORDER BY created_at DESC LIMIT 1
-    """, (email,))
+        SELECT code FROM verification_codes WHERE email = ? AND expiration > ?
+    """, (email, int(time.time())))
     result = cursor.fetchone()
     connection.close()
     if result:
-        code, created_at, expiration_str = result
-        expiration = datetime.strptime(expiration_str, "%Y-%m-%d %H:%M:%S")
-        if datetime.now() > expiration:
-            return None
-        return code, expiration
+        return result[0]
     return None
 
 
-def verify_user_in_database(email: str):
+def delete_verification_code(email: str):
     connection = get_database_connection()
     cursor = connection.cursor()
-    cursor.execute("""
-    UPDATE users
-    SET verified = 1
-    WHERE email = ?
-    """, (email,))
+    cursor.execute("DELETE FROM verification_codes WHERE email = ?", (email,))
     connection.commit()
     connection.close()
 
 
-def save_workout_log(user_id: int, workout_data: dict):
+def purge_expired_verification_codes() -> int:
     connection = get_database_connection()
     cursor = connection.cursor()
-    for workout in workout_data:
-        cursor.execute("""
-        INSERT INTO workouts (user_id, date, exercise, reps, duration, additional_details)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            user_id,
-            workout.get("date"),
-            workout.get("exercise"),
-            workout.get("reps"),
-            workout.get("duration"),
-            workout.get("additional_details"),
-        ))
+    cursor.execute("DELETE FROM verification_codes WHERE expiration <= ?", (int(time.time()),))
     connection.commit()
     connection.close()
+    return cursor.rowcount
 
 
-def get_workouts_from_database(user_id: int):
+def verify_user_in_database(email: str):
     connection = get_database_connection()
     cursor = connection.cursor()
     cursor.execute("""
-    SELECT date, exercise, reps, duration, additional_details
-    FROM workouts
-    WHERE user_id = ?
-    """, (user_id,))
-    workouts = cursor.fetchall()
+    UPDATE users
+    SET verified = 1, data_version = data_version + 1
+    WHERE email = ?
+    """, (email,))
+    connection.commit()
     connection.close()
-    return [
-        {
-            "date": workout[0],
-            "exercise": workout[2],
-            "reps": workout[3],
-            "duration": workout[4],
-            "additional_details": workout[5],
-        }
-        for workout in workouts
-    ]
+
+
+def save_workout_log(user_id: int, workout_data: Iterable[dict]) -> int:
+    connection = get_database_connection()
+    saved_ids = []
+    try:
+        # workout_data may be a generator still being produced by the model. Each workout is committed in its own
+        # short transaction, so the write lock is never held while waiting for the next one.
+        for workout in workout_data:
+            with connection:
+                cursor = connection.execute("""
+                INSERT INTO workouts (user_id, date, exercise, reps, duration, additional_details)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """, (
+                    user_id,
+                    workout.get("date"),
+                    workout.get("exercise"),
+                    workout.get("reps"),
+                    workout.get("duration"),
+                    workout.get("additional_details"),
+                ))
+                connection.execute("UPDATE users SET data_version = data_version + 1 WHERE user_id = ?", (user_id,))
+            saved_ids.append(cursor.lastrowid)
+    except Exception:
+        # The log is saved whole or not at all, so a client retrying after the error doesn't get duplicates
+        if saved_ids:
+            with connection:
+                connection.executemany("DELETE FROM workouts WHERE workout_id = ?",
+                                       [(workout_id,) for workout_id in saved_ids])
+                connection.execute("UPDATE users SET data_version = data_version + 1 WHERE user_id = ?", (user_id,))
+        raise
+    finally:
+        connection.close()
+    return len(saved_ids)
+
+
+def iter_workouts_from_database(user_id: int) -> Iterator[WorkoutRecord]:
+    connection = get_database_connection()
+    try:
+        cursor = connection.execute("""
+        SELECT date, exercise, reps, duration, additional_details
+        FROM workouts
+        WHERE user_id = ?
+        """, (user_id,))
+        # Stream rows off the cursor instead of materializing them with fetchall()
+        for row in cursor:
+            yield WorkoutRecord(*row)
+    finally:
+        connection.close()
+
+
+def get_workouts_page(user_id: int, limit: int, offset: int) -> list[WorkoutRecord]:
+    connection = get_database_connection()
+    try:
+        cursor = connection.execute("""
+        SELECT date, exercise, reps, duration, additional_details
+        FROM workouts
+        WHERE user_id = ?
+        ORDER BY date DESC, workout_id DESC
+        LIMIT ? OFFSET ?
+        """, (user_id, limit, offset))
+        return [WorkoutRecord(*row) for row in cursor]
+    finally:
+        connection.close()
 
 
 def get_formatted_workout_data(user_id: int) -> str:
-    workouts = get_workouts_from_database(user_id)
-    workout_summary = "Here is the user's workout data: \n" + "\n".join(
-        [
-            f"{workout['date']} - {workout['exercise']} for {workout['reps']} reps, "
-            f"duration: {workout['duration']} mins. "
-            f"Notes: {workout['additional_details']}"
-            for workout in workouts
-        ]
+    # The prompt needs a single string, so join still builds the full list of lines; the generator only avoids
+    # also holding every fetched row while the lines are formatted
+    workout_lines = (
+        f"{workout.date} - {workout.exercise} for {workout.reps} reps, "
+        f"duration: {workout.duration} mins. "
+        f"Notes: {workout.additional_details}"
+        for workout in iter_workouts_from_database(user_id)
     )
+    workout_summary = "Here is the user's workout data: \n" + "\n".join(workout_lines)
     return workout_summary
@@ -1,54 +1,102 @@
-import json
+import asyncio
+import hmac
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import timedelta, datetime
 
-from fastapi import Depends, FastAPI, HTTPException, status, Request
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm, HTTPBearer
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
 from authentication import validate_request_and_user, create_access_token, encrypt_email, verify_password, \
     generate_verification_code, hash_password
-from database import get_user_from_database, create_database_and_tables, save_verification_code, \
+from config import get_settings
+from database import get_user_from_database, save_verification_code, \
     get_verification_code, create_user_in_database, verify_user_in_database, update_user_details, save_workout_log, \
-    get_formatted_workout_data
+    update_unverified_user_password, get_formatted_workout_data, get_user_data_version, get_workouts_page, delete_verification_code, \
+    purge_expired_verification_codes
 from middleware.fast_api_middleware import SessionTimeoutMiddleware
-from openai_utils import get_json_from_notes, get_chatgpt_response, generate_motivational_analysis
+from openai_utils import stream_workouts_from_notes, get_chatgpt_response, generate_motivational_analysis
 from models import UserWorkoutNotesInput, UserCreate, EmailVerificationInput, UserDetailsUpdate
 from utils.email_utils import send_verification_email
+from utils.etag_utils import build_etag, etag_matches
 from utils.langchain_utils import add_message_to_memory, generate_response, is_session_expired, reset_session, \
-    memory as langchain_buffer_memory, \
-    summarize_conversation, get_initial_context
-
-app = FastAPI()
-
-app.add_middleware(SessionTimeoutMiddleware, timeout=30)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    get_buffer_length, summarize_conversation, get_initial_context
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 bearer_scheme = HTTPBearer()
 
 limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
 
-create_database_and_tables()
+router = APIRouter()
+
+
+@dataclass(slots=True)
+class SessionState:
+    initial_context_set: bool = False
+
 
 # Dictionary to store session-specific data
-session_data = {}
+session_data: dict[str, SessionState] = {}
+
+
+# How often expired verification codes are deleted, in seconds
+VERIFICATION_CODE_PURGE_INTERVAL = 15 * 60
+
+
+async def purge_verification_codes_periodically():
+    while True:
+        try:
+            await asyncio.to_thread(purge_expired_verification_codes)
+        except Exception as e:
+            # Keep the task alive; the next run will retry
+            print(f"Failed to purge expired verification codes: {e}")
+        await asyncio.sleep(VERIFICATION_CODE_PURGE_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail fast on missing configuration. The schema is created by `python migrate.py`, not here,
+    # and the LLM clients are built on the first request that needs them.
+    get_settings()
+    purge_task = asyncio.create_task(purge_verification_codes_periodically())
+    yield
+    purge_task.cancel()
+    try:
+        await purge_task
+    except asyncio.CancelledError:
+        pass
+    session_data.clear()
+
 
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
 
-@app.post("/register", status_code=status.HTTP_201_CREATED)
+    app.add_middleware(SessionTimeoutMiddleware, timeout=30)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    app.state.limiter = limiter
+
+    app.include_router(router)
+
+    return app
+
+
+@router.post("/register", status_code=status.HTTP_201_CREATED)
 @limiter.limit("5 per minute")
 async def register_user(request: Request, user: UserCreate):
     existing_user = get_user_from_database(user.email)
-    if existing_user:
+    if existing_user and existing_user["verified"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered",
@@ -56,32 +104,30 @@ async def register_user(request: Request, user: UserCreate):
 
     code = generate_verification_code()
     hashed_password = hash_password(user.password)
-    create_user_in_database(user.email, hashed_password)
+    if existing_user:
+        # Not verified yet, e.g. the earlier code expired: issue a new code and take the latest password
+        update_unverified_user_password(user.email, hashed_password)
+    else:
+        create_user_in_database(user.email, hashed_password)
     save_verification_code(user.email, code)
     send_verification_email(user.email, code)
     return {"msg": "Verification code sent to email"}
 
 
-@app.post("/verify", status_code=status.HTTP_200_OK)
+@router.post("/verify", status_code=status.HTTP_200_OK)
 @limiter.limit("5 per minute")
 async def verify_user(request: Request, input: EmailVerificationInput):
-    result = get_verification_code(input.email)
-    if result is None:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid or expired verification code",
-        )
-
-    stored_code, expiration = result
+    stored_code = get_verification_code(input.email)
 
-    # Check if the provided code matches the stored code and if the code is still valid
-    if stored_code != input.code or datetime.now() > expiration:
+    # Expired codes are filtered out by the lookup; compare in constant time to avoid leaking the code
+    if stored_code is None or not hmac.compare_digest(stored_code.encode(), input.code.encode()):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired verification code",
         )
 
     verify_user_in_database(input.email)
+    delete_verification_code(input.email)
     encrypted_email = encrypt_email(input.email)
     access_token = create_access_token(
         data={"sub": encrypted_email}, expires_delta=None  # long-lived token
@@ -89,7 +135,7 @@ async def verify_user(request: Request, input: EmailVerificationInput):
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@app.post("/token")
+@router.post("/token")
 async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     # Find a user in the db using provided email
     user = get_user_from_database(form_data.username)
@@ -118,31 +164,43 @@ async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends
         )
 
 
-@app.post("/update-personal-details", status_code=status.HTTP_200_OK)
+@router.post("/update-personal-details", status_code=status.HTTP_200_OK)
 async def update_personal_details(request: Request, details: UserDetailsUpdate,
                                   user: dict = Depends(validate_request_and_user)):
     update_user_details(user["email"], details.height, details.weight, details.age, details.gender, details.goals)
     return {"msg": "Personal details updated successfully"}
 
 
-@app.post("/save-workout")
-async def save_workout(request: Request, user_workout_input: UserWorkoutNotesInput,
-                       user: dict = Depends(validate_request_and_user)):
+# A plain def so FastAPI runs it in its threadpool: the streamed extraction and the inserts are blocking calls
+# that would otherwise stall the event loop for the whole generation
+@router.post("/save-workout")
+def save_workout(request: Request, user_workout_input: UserWorkoutNotesInput,
+                 user: dict = Depends(validate_request_and_user)):
     if not user_workout_input.notes:
         raise HTTPException(status_code=400, detail="No notes provided")
     try:
-        json_output = get_json_from_notes(user_workout_input.notes)
-
-        # Parse JSON output to Python dictionary
-        workout_data = json.loads(json_output)
-
         # Get the user's ID
         user_data = get_user_from_database(user["email"])
         user_id = user_data["user_id"]
 
-        # Save workout logs in the database
-        save_workout_log(user_id, workout_data)
+        # Save each workout as soon as it has been extracted, keeping a copy for the response
+        workout_data = []
+
+        def collect(workouts):
+            for workout in workouts:
+                workout_data.append(workout)
+                yield workout
+
+        # Removes anything it already saved if the stream fails, so an error here means nothing was stored
+        save_workout_log(user_id, collect(stream_workouts_from_notes(user_workout_input.notes)))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not workout_data:
+        raise HTTPException(status_code=422, detail="No workouts could be extracted from the notes")
 
+    # The workouts are stored from here on, so a failed analysis must not turn the response into an error
+    try:
         # Get workout history
         workout_history = get_formatted_workout_data(user_id)
 
@@ -150,24 +208,23 @@ async def save_workout(request: Request, user_workout_input: UserWorkoutNotesInp
         prompt_context = get_initial_context(user_data, workout_history)
 
         analysis_output = generate_motivational_analysis(prompt_context, workout_data)
-
-        return {
-            "data": workout_data,
-            "analysis": analysis_output,
-        }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"Failed to generate motivational analysis: {e}")
+        analysis_output = None
 
+    return {
+        "data": workout_data,
+        "analysis": analysis_output,
+    }
 
-@app.post("/chat", status_code=status.HTTP_200_OK)
+
+@router.post("/chat", status_code=status.HTTP_200_OK)
 async def chat_with_gpt(request: Request, user: dict = Depends(validate_request_and_user)):
     session_id = user["email"]
 
     # Initialise the session if there isn't one already
     if session_id not in session_data:
-        session_data[session_id] = {
-            "initial_context_set": False
-        }
+        session_data[session_id] = SessionState()
 
     # Handle expired sessions
     if is_session_expired():
@@ -176,19 +233,19 @@ async def chat_with_gpt(request: Request, user: dict = Depends(validate_request_
         return {"message": "Session expired. Please start a new session."}
 
     # Only add initial prompt context into the chatGPT request at the start of the session, not with every request
-    include_initial_context = not session_data[session_id]["initial_context_set"]
+    include_initial_context = not session_data[session_id].initial_context_set
 
     if include_initial_context:
         user_data = get_user_from_database(user["email"])
         user_id = user_data["user_id"]
         workout_history = get_formatted_workout_data(user_id)
         initial_context = get_initial_context(user_data, workout_history)
-        session_data[session_id]["initial_context_set"] = True
+        session_data[session_id].initial_context_set = True
     else:
         initial_context = ""  # Empty since it's already been included
 
     # Summarize conversation if needed
-    if len(langchain_buffer_memory.buffer) > 9000:
+    if get_buffer_length() > 9000:
         summarize_conversation()
 
     data = await request.json()
@@ -211,6 +268,68 @@ async def chat_with_gpt(request: Request, user: dict = Depends(validate_request_
     }
 
 
+# Clients may keep the response but must revalidate it with If-None-Match before reuse
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE})
+
+
+@router.get("/profile", status_code=status.HTTP_200_OK)
+async def get_profile(request: Request, if_none_match: str | None = Header(default=None),
+                      user: dict = Depends(validate_request_and_user)):
+    # Answer from the user's data version alone when the client's copy is current
+    version = get_user_data_version(user["email"])
+    if version is not None:
+        etag = build_etag("profile", user["email"], version)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+    user_data = get_user_from_database(user["email"])
+    if user_data is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    etag = build_etag("profile", user["email"], user_data["data_version"])
+
+    profile = {
+        "email": user_data["email"],
+        "height": user_data["height"],
+        "weight": user_data["weight"],
+        "age": user_data["age"],
+        "gender": user_data["gender"],
+        "goals": user_data["goals"],
+        "verified": bool(user_data["verified"]),
+    }
+    return ORJSONResponse(content=profile, headers={"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE})
+
+
+@router.get("/workouts", status_code=status.HTTP_200_OK)
+async def get_workout_history(request: Request, limit: int = Query(default=50, ge=1, le=200),
+                              offset: int = Query(default=0, ge=0),
+                              if_none_match: str | None = Header(default=None),
+                              user: dict = Depends(validate_request_and_user)):
+    version = get_user_data_version(user["email"])
+    if version is not None:
+        etag = build_etag("workouts", user["email"], version, limit, offset)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+    user_data = get_user_from_database(user["email"])
+    if user_data is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    etag = build_etag("workouts", user["email"], user_data["data_version"], limit, offset)
+
+    workouts = get_workouts_page(user_data["user_id"], limit, offset)
+    return ORJSONResponse(
+        content={"data": workouts, "limit": limit, "offset": offset},
+        headers={"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE},
+    )
+
+
+app = create_app()
+
 if __name__ == '__main__':
     import uvicorn
 
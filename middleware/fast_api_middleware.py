@@ -1,20 +1,21 @@
+import time
 from fastapi import Request
-from datetime import datetime, timedelta
 
 class SessionTimeoutMiddleware:
     def __init__(self, app, timeout: int = 30):
         self.app = app
         self.timeout = timeout  # timeout in minutes
-        self.sessions = {}
+        # user_id -> last activity as a monotonic timestamp; a float is far lighter than a datetime
+        self.sessions: dict[str, float] = {}
 
     async def __call__(self, scope, receive, send):
         if scope["type"] == "http":
             request = Request(scope, receive)
             user_id = request.headers.get("user-id")
             if user_id:
-                now = datetime.utcnow()
+                now = time.monotonic()
                 last_active = self.sessions.get(user_id)
-                if last_active and now - last_active > timedelta(minutes=self.timeout):
+                if last_active is not None and now - last_active > self.timeout * 60:
                     # End session due to inactivity
                     del self.sessions[user_id]
                     request.state.session_expired = True
@@ -0,0 +1,7 @@
+from database import create_database_and_tables
+
+# One-shot schema setup. Run this before starting the API server:
+#   python migrate.py
+if __name__ == '__main__':
+    create_database_and_tables()
+    print("Database schema is up to date")
@@ -1,4 +1,7 @@
-from pydantic import BaseModel, EmailStr
+import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, StrictInt
 
 
 class UserCreate(BaseModel):
@@ -21,3 +24,19 @@ class UserDetailsUpdate(BaseModel):
 
 class UserWorkoutNotesInput(BaseModel):
     notes: str
+
+
+# Mirrors the columns of the workouts table that are filled from the user's notes
+# Counts are strict so that values like true or "12 reps" go through repair_workout_entry instead of being coerced
+class WorkoutEntry(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    date: datetime.date
+    exercise: str = Field(min_length=1, max_length=100)
+    reps: Optional[StrictInt] = Field(default=None, ge=0)
+    duration: Optional[StrictInt] = Field(default=None, ge=0, description="Duration in minutes")
+    additional_details: Optional[str] = None
+
+
+class WorkoutLog(BaseModel):
+    workouts: list[WorkoutEntry]
@@ -1,29 +1,132 @@
-import requests
-from config import settings
+import datetime
+import json
+import re
+from typing import Iterator, Optional
 
-OPENAI_API_KEY = settings.OPENAI_API_KEY
+from pydantic import ValidationError
 
+from config import get_settings
+from models import WorkoutEntry, WorkoutLog
+from utils.json_stream_utils import JsonArrayItemParser
 
-def get_json_from_notes(notes: str):
-    prompt = f"Transform the following workout notes into JSON format with the headers: Workout ID, Date, Time, Exercise, Set ID, Reps, Is Dropset, Duration, Calories.\n\nNotes:\n{notes}"
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
+OPENAI_CHAT_COMPLETIONS_URL = "https://api.openai.com/v1/chat/completions"
+
+
+def _openai_headers() -> dict:
+    return {
+        "Authorization": f"Bearer {get_settings().OPENAI_API_KEY}",
         "Content-Type": "application/json"
     }
+
+
+def _post_chat_completion(payload: dict) -> dict:
+    # requests is imported on first call to keep it off the startup path
+    import requests
+
+    response = requests.post(OPENAI_CHAT_COMPLETIONS_URL, headers=_openai_headers(), json=payload)
+    response.raise_for_status()
+    return response.json()
+
+
+# Yields the delta of each server-sent event from a streamed chat completion
+def _stream_chat_completion(payload: dict) -> Iterator[dict]:
+    import requests
+
+    with requests.post(OPENAI_CHAT_COMPLETIONS_URL, headers=_openai_headers(), json={**payload, "stream": True},
+                       stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or []
+            if choices:
+                yield choices[0].get("delta") or {}
+
+
+def _leading_int(value) -> Optional[int]:
+    # "12 reps", "30 mins" and 45.0 all become the number they start with. Booleans and negative numbers
+    # aren't counts, so they become None rather than failing validation and losing the whole workout.
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if value >= 0 else None
+    match = re.match(r"\s*(\d+)", str(value))
+    return int(match.group(1)) if match else None
+
+
+# Validates one extracted workout, fixing what can be fixed locally instead of asking the model again.
+# Returns None for items that can't be saved, such as ones without an exercise.
+def repair_workout_entry(raw: dict, default_date: datetime.date) -> Optional[WorkoutEntry]:
+    try:
+        return WorkoutEntry.model_validate(raw)
+    except ValidationError:
+        pass
+
+    exercise = str(raw.get("exercise") or "").strip()[:100]
+    if not exercise:
+        return None
+    try:
+        date = datetime.date.fromisoformat(str(raw.get("date"))[:10])
+    except ValueError:
+        date = default_date
+    additional_details = raw.get("additional_details")
+
+    try:
+        return WorkoutEntry(
+            date=date,
+            exercise=exercise,
+            reps=_leading_int(raw.get("reps")),
+            duration=_leading_int(raw.get("duration")),
+            additional_details=None if additional_details is None else str(additional_details),
+        )
+    except ValidationError:
+        return None
+
+
+# Extracts workouts from free-form notes, yielding each one as soon as the model has finished writing it.
+# The model is forced to call a function whose parameters are the WorkoutLog schema, and its streamed
+# arguments are parsed incrementally so callers can store the first workouts while the rest are generated.
+def stream_workouts_from_notes(notes: str) -> Iterator[dict]:
+    today = datetime.date.today()
+    prompt = f"Today's date is {today.isoformat()}. Record every exercise in the following workout notes.\n\nNotes:\n{notes}"
     payload = {
         "model": "gpt-4",
         "messages": [
-            {"role": "system", "content": "You are an assistant that transforms workout notes into JSON format."},
+            {"role": "system", "content": "You are an assistant that transforms workout notes into structured workout records."},
             {"role": "user", "content": prompt}
         ],
-        "temperature": 0.5
+        "tools": [{
+            "type": "function",
+            "function": {
+                "name": "record_workouts",
+                "description": "Record the workouts described in the user's notes.",
+                "parameters": WorkoutLog.model_json_schema(),
+            },
+        }],
+        "tool_choice": {"type": "function", "function": {"name": "record_workouts"}},
+        "temperature": 0
     }
-    response = requests.post(url, headers=headers, json=payload)
-    response.raise_for_status()
-    response_data = response.json()
-    json_output = response_data['choices'][0]['message']['content']
-    return json_output
+
+    parser = JsonArrayItemParser()
+
+    def repaired(raw_items):
+        for raw in raw_items:
+            workout = repair_workout_entry(raw, today)
+            if workout is not None:
+                yield workout.model_dump(mode="json")
+
+    for delta in _stream_chat_completion(payload):
+        # Function arguments arrive in tool_calls; plain content is parsed too in case the model ignores the tool
+        for tool_call in delta.get("tool_calls") or []:
+            yield from repaired(parser.feed(tool_call.get("function", {}).get("arguments") or ""))
+        yield from repaired(parser.feed(delta.get("content") or ""))
+
+    partial = parser.close()
+    if partial is not None:
+        yield from repaired([partial])
 
 
 def generate_motivational_analysis(initial_context, new_workout):
@@ -33,11 +136,6 @@ def generate_motivational_analysis(initial_context, new_workout):
         f"Recent workout: {new_workout}\n\n"
         "Provide a motivational analysis of the user's recent workout history, including insights and optional charts/graphs that might be interesting to the user. Focus on sharing insights that are likely to be motivational."
     )
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
-        "Content-Type": "application/json"
-    }
     payload = {
         "model": "gpt-4",
         "messages": [
@@ -47,25 +145,16 @@ def generate_motivational_analysis(initial_context, new_workout):
         ],
         "temperature": 0.5
     }
-    response = requests.post(url, headers=headers, json=payload)
-    response.raise_for_status()
-    response_data = response.json()
+    response_data = _post_chat_completion(payload)
 
     return response_data['choices'][0]['message']['content']
 
 
 def get_chatgpt_response(messages: list):
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
-        "Content-Type": "application/json"
-    }
     payload = {
         "model": "gpt-4",
         "messages": messages,
         "temperature": 0.5
     }
-    response = requests.post(url, headers=headers, json=payload)
-    response.raise_for_status()
-    response_data = response.json()
+    response_data = _post_chat_completion(payload)
     return response_data['choices'][0]['message']['content']
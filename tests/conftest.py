@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+from environment import TEST_ENVIRONMENT
+
+# Settings are read on first use, so the test environment only has to be in place before that
+for key, value in TEST_ENVIRONMENT.items():
+    os.environ.setdefault(key, value)
+
+from config import get_settings  # noqa: E402
+from database import create_database_and_tables  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "test-collection.db"))
+    get_settings.cache_clear()
+    create_database_and_tables()
+    yield tmp_path / "test-collection.db"
+    get_settings.cache_clear()
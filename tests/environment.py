@@ -0,0 +1,13 @@
+from cryptography.fernet import Fernet
+
+# Settings required by config.Settings; applied by conftest and passed to subprocesses that import the app
+TEST_ENVIRONMENT = {
+    "OPENAI_API_KEY": "test-openai-key",
+    "JWT_SECRET_KEY": "test-jwt-secret",
+    "FERNET_ENCRYPTION_KEY": Fernet.generate_key().decode(),
+    "EMAIL_HOST": "localhost",
+    "EMAIL_PORT": "25",
+    "EMAIL_USERNAME": "test",
+    "EMAIL_PASSWORD": "test",
+    "EMAIL_FROM": "coach@example.com",
+}
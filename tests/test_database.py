@@ -0,0 +1,166 @@
+import sqlite3
+import time
+
+import pytest
+
+from database import create_database_and_tables, create_user_in_database, get_user_data_version, \
+    get_user_from_database, get_verification_code, iter_workouts_from_database, purge_expired_verification_codes, \
+    save_verification_code, save_workout_log, update_user_details, verify_user_in_database
+
+EMAIL = "athlete@example.com"
+
+WORKOUT = {"date": "2024-06-01", "exercise": "Squat", "reps": 10, "duration": None, "additional_details": None}
+
+
+def test_data_version_starts_at_zero_and_is_bumped_by_writes(database):
+    create_user_in_database(EMAIL, "hashed-password")
+    assert get_user_data_version(EMAIL) == 0
+
+    verify_user_in_database(EMAIL)
+    update_user_details(EMAIL, 180, 80, 30, "female", "Get stronger")
+
+    assert get_user_data_version(EMAIL) == 2
+
+
+def test_data_version_is_none_for_unknown_user(database):
+    assert get_user_data_version("nobody@example.com") is None
+
+
+def test_migration_adds_data_version_to_existing_users_table(database):
+    connection = sqlite3.connect(database)
+    connection.execute("DROP TABLE users")
+    connection.execute("""
+    CREATE TABLE users (
+        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email VARCHAR(255) NOT NULL UNIQUE,
+        hashed_password VARCHAR(255) NOT NULL,
+        height INTEGER,
+        weight INTEGER,
+        age INTEGER,
+        gender VARCHAR(100),
+        goals TEXT,
+        verified BOOLEAN NOT NULL DEFAULT 0
+    )
+    """)
+    connection.execute("INSERT INTO users (email, hashed_password) VALUES (?, ?)", (EMAIL, "hashed-password"))
+    connection.commit()
+    connection.close()
+
+    create_database_and_tables()
+
+    assert get_user_data_version(EMAIL) == 0
+
+
+def expire_verification_code(database, email):
+    connection = sqlite3.connect(database)
+    connection.execute("UPDATE verification_codes SET expiration = ? WHERE email = ?", (int(time.time()) - 1, email))
+    connection.commit()
+    connection.close()
+
+
+def count_verification_codes(database):
+    connection = sqlite3.connect(database)
+    count = connection.execute("SELECT COUNT(*) FROM verification_codes").fetchone()[0]
+    connection.close()
+    return count
+
+
+def test_save_verification_code_replaces_pending_code(database):
+    save_verification_code(EMAIL, "111111")
+    save_verification_code(EMAIL, "222222")
+
+    assert get_verification_code(EMAIL) == "222222"
+    assert count_verification_codes(database) == 1
+
+
+def test_expired_verification_code_is_not_returned(database):
+    save_verification_code(EMAIL, "111111")
+    expire_verification_code(database, EMAIL)
+
+    assert get_verification_code(EMAIL) is None
+
+
+def test_purge_deletes_only_expired_codes(database):
+    save_verification_code(EMAIL, "111111")
+    save_verification_code("pending@example.com", "222222")
+    expire_verification_code(database, EMAIL)
+
+    assert purge_expired_verification_codes() == 1
+    assert get_verification_code("pending@example.com") == "222222"
+    assert count_verification_codes(database) == 1
+
+
+def test_migration_keeps_latest_unexpired_code_per_email(database):
+    connection = sqlite3.connect(database)
+    connection.execute("DROP TABLE verification_codes")
+    connection.execute("""
+    CREATE TABLE verification_codes (
+        email VARCHAR(255) NOT NULL,
+        code VARCHAR(6) NOT NULL,
+        expiration TIMESTAMP NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    # The old table stored local-time expiration strings
+    rows = [
+        (EMAIL, "111111", "+10 minutes", "2024-06-01 10:00:00"),
+        (EMAIL, "222222", "+20 minutes", "2024-06-01 10:05:00"),
+        ("expired@example.com", "333333", "-10 minutes", "2024-06-01 10:00:00"),
+    ]
+    for email, code, offset, created_at in rows:
+        connection.execute("""
+        INSERT INTO verification_codes (email, code, expiration, created_at)
+        VALUES (?, ?, datetime('now', 'localtime', ?), ?)
+        """, (email, code, offset, created_at))
+    connection.commit()
+    connection.close()
+
+    create_database_and_tables()
+
+    assert get_verification_code(EMAIL) == "222222"
+    assert get_verification_code("expired@example.com") is None
+    assert count_verification_codes(database) == 1
+
+
+def test_save_workout_log_does_not_hold_write_lock_between_workouts(database):
+    create_user_in_database(EMAIL, "hashed-password")
+    user_id = get_user_from_database(EMAIL)["user_id"]
+
+    def streamed_workouts():
+        yield dict(WORKOUT, exercise="Squat")
+        # Another writer must get in while the model is still generating
+        other_writer = sqlite3.connect(database, timeout=0)
+        other_writer.execute("INSERT INTO verification_codes (email, code, expiration) VALUES (?, ?, ?)",
+                             ("other@example.com", "123456", int(time.time()) + 60))
+        other_writer.commit()
+        other_writer.close()
+        yield dict(WORKOUT, exercise="Bench press")
+
+    assert save_workout_log(user_id, streamed_workouts()) == 2
+    assert [workout.exercise for workout in iter_workouts_from_database(user_id)] == ["Squat", "Bench press"]
+    assert get_user_data_version(EMAIL) == 2
+
+
+def test_save_workout_log_without_workouts_keeps_data_version(database):
+    create_user_in_database(EMAIL, "hashed-password")
+
+    assert save_workout_log(get_user_from_database(EMAIL)["user_id"], iter([])) == 0
+    assert get_user_data_version(EMAIL) == 0
+
+
+def test_save_workout_log_removes_workouts_saved_before_stream_fails(database):
+    create_user_in_database(EMAIL, "hashed-password")
+    user_id = get_user_from_database(EMAIL)["user_id"]
+    save_workout_log(user_id, [dict(WORKOUT, exercise="Earlier session")])
+
+    def failing_stream():
+        yield WORKOUT
+        yield WORKOUT
+        raise ConnectionError("stream interrupted")
+
+    with pytest.raises(ConnectionError):
+        save_workout_log(user_id, failing_stream())
+
+    assert [workout.exercise for workout in iter_workouts_from_database(user_id)] == ["Earlier session"]
+    # Bumped by every insert and by the removal, so clients that saw the partial log refetch
+    assert get_user_data_version(EMAIL) == 4
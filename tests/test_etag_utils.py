@@ -0,0 +1,36 @@
+from utils.etag_utils import build_etag, etag_matches
+
+ETAG = build_etag("profile", "athlete@example.com", 3)
+
+
+def test_build_etag_is_strong_and_changes_with_version():
+    assert ETAG.startswith('"') and ETAG.endswith('"')
+    assert build_etag("profile", "athlete@example.com", 4) != ETAG
+
+
+def test_build_etag_differs_per_user_and_page():
+    assert build_etag("profile", "other@example.com", 3) != ETAG
+    assert build_etag("workouts", "athlete@example.com", 3, 50, 0) != build_etag(
+        "workouts", "athlete@example.com", 3, 50, 50)
+
+
+def test_etag_matches_exact_tag():
+    assert etag_matches(ETAG, ETAG)
+
+
+def test_etag_matches_tag_in_list():
+    assert etag_matches(f'"stale", {ETAG} , "other"', ETAG)
+
+
+def test_etag_matches_ignores_weak_prefix():
+    assert etag_matches(f"W/{ETAG}", ETAG)
+
+
+def test_etag_matches_wildcard():
+    assert etag_matches("*", ETAG)
+
+
+def test_etag_does_not_match_missing_or_different_tag():
+    assert not etag_matches(None, ETAG)
+    assert not etag_matches("", ETAG)
+    assert not etag_matches('"stale", "other"', ETAG)
@@ -0,0 +1,105 @@
+import pytest
+
+from utils.json_stream_utils import JsonArrayItemParser
+
+DOCUMENT = (
+    '{"workouts": ['
+    '{"date": "2024-06-01", "exercise": "Squat", "reps": 10}, '
+    '{"date": "2024-06-01", "exercise": "Run", "duration": 30}'
+    ']}'
+)
+
+ITEMS = [
+    {"date": "2024-06-01", "exercise": "Squat", "reps": 10},
+    {"date": "2024-06-01", "exercise": "Run", "duration": 30},
+]
+
+
+def parse(text, chunk_size=None):
+    parser = JsonArrayItemParser()
+    chunk_size = chunk_size or len(text)
+    items = []
+    for start in range(0, len(text), chunk_size):
+        items += parser.feed(text[start:start + chunk_size])
+    return items, parser
+
+
+def test_parses_whole_document():
+    items, parser = parse(DOCUMENT)
+
+    assert items == ITEMS
+    assert parser.close() is None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7])
+def test_parses_chunks_split_mid_token(chunk_size):
+    items, _ = parse(DOCUMENT, chunk_size)
+
+    assert items == ITEMS
+
+
+def test_yields_each_item_as_soon_as_it_closes():
+    parser = JsonArrayItemParser()
+    first_item_end = DOCUMENT.index("}") + 1
+
+    assert parser.feed(DOCUMENT[:first_item_end]) == ITEMS[:1]
+    assert parser.feed(DOCUMENT[first_item_end:]) == ITEMS[1:]
+
+
+def test_brackets_and_escaped_quotes_inside_strings():
+    text = '{"workouts": [{"exercise": "Curl \\"21s\\" [7] {x}", "additional_details": "a, b } ]"}]}'
+
+    items, _ = parse(text, 3)
+
+    assert items == [{"exercise": 'Curl "21s" [7] {x}', "additional_details": "a, b } ]"}]
+
+
+def test_nested_values_stay_inside_their_item():
+    text = '{"workouts": [{"exercise": "Run", "splits": [1, {"km": 2}], "extra": {"hr": 150}}]}'
+
+    items, _ = parse(text)
+
+    assert items == [{"exercise": "Run", "splits": [1, {"km": 2}], "extra": {"hr": 150}}]
+
+
+def test_ignores_markdown_fence():
+    items, _ = parse(f"```json\n{DOCUMENT}\n```", 5)
+
+    assert items == ITEMS
+
+
+@pytest.mark.parametrize("prose", [
+    "Here are your workouts [see below]: ",
+    "Logging [3 exercises: ",
+    "Done ] ok } ",
+    'She said "{not json" ',
+    "Workout { summary ",
+])
+def test_ignores_unbalanced_brackets_in_prose_before_document(prose):
+    items, _ = parse(prose + DOCUMENT, 4)
+
+    assert items == ITEMS
+
+
+def test_close_recovers_complete_fields_of_truncated_item():
+    truncated = '{"workouts": [{"exercise": "Squat", "reps": 10}, {"exercise": "Bench", "reps": 8, "additional_det'
+
+    items, parser = parse(truncated, 6)
+
+    assert items == [{"exercise": "Squat", "reps": 10}]
+    assert parser.close() == {"exercise": "Bench", "reps": 8}
+
+
+def test_close_returns_none_when_truncated_item_has_no_complete_field():
+    items, parser = parse('{"workouts": [{"exercise": "Sq')
+
+    assert items == []
+    assert parser.close() is None
+
+
+def test_skips_malformed_item_and_keeps_going():
+    text = '{"workouts": [{"exercise": "Squat", "reps": 1 0}, {"exercise": "Run"}]}'
+
+    items, _ = parse(text)
+
+    assert items == [{"exercise": "Run"}]
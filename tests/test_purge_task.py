@@ -0,0 +1,28 @@
+import asyncio
+
+import main
+
+
+def test_purge_task_keeps_running_after_an_error(monkeypatch):
+    calls = []
+
+    def purge():
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError("unexpected failure")
+        return 0
+
+    monkeypatch.setattr(main, "purge_expired_verification_codes", purge)
+    monkeypatch.setattr(main, "VERIFICATION_CODE_PURGE_INTERVAL", 0)
+
+    async def run_briefly():
+        task = asyncio.create_task(main.purge_verification_codes_periodically())
+        while len(calls) < 3 and not task.done():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        return task
+
+    task = asyncio.run(run_briefly())
+
+    assert len(calls) >= 3
+    assert task.cancelled()
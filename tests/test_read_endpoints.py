@@ -0,0 +1,80 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from authentication import validate_request_and_user
+from database import create_user_in_database, get_user_from_database, save_workout_log, update_user_details
+
+EMAIL = "athlete@example.com"
+
+WORKOUT = {"date": "2024-06-01", "exercise": "Squat", "reps": 10, "duration": None, "additional_details": None}
+
+
+@pytest.fixture
+def client(database):
+    create_user_in_database(EMAIL, "hashed-password")
+    app = main.create_app()
+    app.dependency_overrides[validate_request_and_user] = lambda: {"email": EMAIL}
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/profile", "/workouts"])
+def test_get_returns_etag(client, path):
+    response = client.get(path)
+
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('"')
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+
+@pytest.mark.parametrize("path", ["/profile", "/workouts"])
+def test_matching_if_none_match_returns_304(client, path):
+    etag = client.get(path).headers["ETag"]
+
+    response = client.get(path, headers={"If-None-Match": f'"stale", {etag}'})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert response.content == b""
+
+
+@pytest.mark.parametrize("path", ["/profile", "/workouts"])
+def test_304_path_does_not_load_user(client, path, monkeypatch):
+    etag = client.get(path).headers["ETag"]
+
+    def fail(email):
+        raise AssertionError("get_user_from_database called on the 304 path")
+
+    monkeypatch.setattr(main, "get_user_from_database", fail)
+
+    assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_profile_etag_changes_after_update_user_details(client):
+    etag = client.get("/profile").headers["ETag"]
+
+    update_user_details(EMAIL, 180, 80, 30, "female", "Run a marathon")
+    response = client.get("/profile", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["goals"] == "Run a marathon"
+
+
+def test_workouts_etag_changes_after_save_workout_log(client):
+    etag = client.get("/workouts").headers["ETag"]
+
+    save_workout_log(get_user_from_database(EMAIL)["user_id"], [WORKOUT])
+    response = client.get("/workouts", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["data"] == [WORKOUT]
+
+
+def test_workouts_pages_have_distinct_etags(client):
+    first_page = client.get("/workouts", params={"limit": 1, "offset": 0})
+    second_page = client.get("/workouts", params={"limit": 1, "offset": 1})
+
+    assert first_page.headers["ETag"] != second_page.headers["ETag"]
@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from authentication import verify_password
+from database import get_user_from_database, get_verification_code, verify_user_in_database
+
+EMAIL = "athlete@example.com"
+
+
+@pytest.fixture
+def client(database, monkeypatch):
+    sent_codes = []
+    monkeypatch.setattr(main, "send_verification_email", lambda email, code: sent_codes.append(code))
+    main.limiter.reset()
+    test_client = TestClient(main.create_app())
+    test_client.sent_codes = sent_codes
+    return test_client
+
+
+def register(client, password="first-password"):
+    return client.post("/register", json={"email": EMAIL, "password": password})
+
+
+def test_register_sends_code(client):
+    response = register(client)
+
+    assert response.status_code == 201
+    assert get_verification_code(EMAIL) == client.sent_codes[-1]
+
+
+def test_registering_again_before_verifying_issues_new_code(client):
+    register(client)
+    response = register(client, password="second-password")
+
+    assert response.status_code == 201
+    assert len(client.sent_codes) == 2
+    assert get_verification_code(EMAIL) == client.sent_codes[-1]
+    assert verify_password("second-password", get_user_from_database(EMAIL)["hashed_password"])
+
+
+def test_registering_verified_email_is_rejected(client):
+    register(client)
+    verify_user_in_database(EMAIL)
+
+    response = register(client, password="second-password")
+
+    assert response.status_code == 400
+    assert len(client.sent_codes) == 1
+    assert verify_password("first-password", get_user_from_database(EMAIL)["hashed_password"])
+
+
+def test_new_code_verifies_the_user(client):
+    register(client)
+    register(client)
+
+    response = client.post("/verify", json={"email": EMAIL, "code": client.sent_codes[-1]})
+
+    assert response.status_code == 200
+    assert get_user_from_database(EMAIL)["verified"]
+    assert get_verification_code(EMAIL) is None
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from authentication import validate_request_and_user
+from database import create_user_in_database, get_user_from_database, iter_workouts_from_database
+
+EMAIL = "athlete@example.com"
+
+WORKOUT = {"date": "2024-06-01", "exercise": "Squat", "reps": 10, "duration": None, "additional_details": None}
+
+
+@pytest.fixture
+def client(database, monkeypatch):
+    create_user_in_database(EMAIL, "hashed-password")
+    monkeypatch.setattr(main, "generate_motivational_analysis", lambda context, workouts: "Great work")
+    app = main.create_app()
+    app.dependency_overrides[validate_request_and_user] = lambda: {"email": EMAIL}
+    return TestClient(app)
+
+
+def saved_workouts():
+    return list(iter_workouts_from_database(get_user_from_database(EMAIL)["user_id"]))
+
+
+def test_saves_streamed_workouts(client, monkeypatch):
+    monkeypatch.setattr(main, "stream_workouts_from_notes", lambda notes: iter([WORKOUT, WORKOUT]))
+
+    response = client.post("/save-workout", json={"notes": "2x squat"})
+
+    assert response.status_code == 200
+    assert response.json() == {"data": [WORKOUT, WORKOUT], "analysis": "Great work"}
+    assert len(saved_workouts()) == 2
+
+
+def test_failed_stream_stores_nothing(client, monkeypatch):
+    def failing_stream(notes):
+        yield WORKOUT
+        raise ConnectionError("stream interrupted")
+
+    monkeypatch.setattr(main, "stream_workouts_from_notes", failing_stream)
+
+    response = client.post("/save-workout", json={"notes": "squat"})
+
+    assert response.status_code == 500
+    assert saved_workouts() == []
+
+
+def test_no_extracted_workouts_returns_422(client, monkeypatch):
+    monkeypatch.setattr(main, "stream_workouts_from_notes", lambda notes: iter([]))
+
+    response = client.post("/save-workout", json={"notes": "rest day"})
+
+    assert response.status_code == 422
+
+
+def test_failed_analysis_still_reports_saved_workouts(client, monkeypatch):
+    def failing_analysis(context, workouts):
+        raise ConnectionError("analysis unavailable")
+
+    monkeypatch.setattr(main, "stream_workouts_from_notes", lambda notes: iter([WORKOUT]))
+    monkeypatch.setattr(main, "generate_motivational_analysis", failing_analysis)
+
+    response = client.post("/save-workout", json={"notes": "squat"})
+
+    assert response.status_code == 200
+    assert response.json() == {"data": [WORKOUT], "analysis": None}
+    assert len(saved_workouts()) == 1
+
+
+def test_runs_outside_the_event_loop(client, monkeypatch):
+    def stream_checking_loop(notes):
+        # Raises if called on the event loop's thread, i.e. if the blocking work would stall the loop
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        yield WORKOUT
+
+    monkeypatch.setattr(main, "stream_workouts_from_notes", stream_checking_loop)
+
+    assert client.post("/save-workout", json={"notes": "squat"}).status_code == 200
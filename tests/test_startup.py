@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+
+from environment import TEST_ENVIRONMENT
+
+# Time spent executing this repo's own module bodies while importing main, excluding third-party imports such as
+# FastAPI itself. It is around 0.07s today; eagerly building clients or running DDL at import time would blow it.
+OWN_MODULES_IMPORT_BUDGET_SECONDS = 0.25
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = """
+import json
+import os
+import sys
+
+import main
+import authentication
+
+project_root = os.getcwd()
+
+
+def is_own_module(module):
+    path = os.path.abspath(getattr(module, "__file__", None) or "/")
+    # A virtualenv inside the checkout still holds third-party code
+    return path.startswith(project_root + os.sep) and "site-packages" not in path
+
+
+print(json.dumps({
+    "own_modules": sorted(name for name, module in list(sys.modules.items()) if is_own_module(module)),
+    "heavy_modules": sorted(
+        name for name in sys.modules if name.startswith(("langchain", "requests"))
+    ),
+    "fernet_built": authentication.get_fernet.cache_info().currsize > 0,
+}))
+"""
+
+
+def import_main_in_clean_process() -> dict:
+    # A fresh interpreter, so nothing already imported by the test session hides a slow import
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_PROBE],
+        cwd=PROJECT_ROOT,
+        env={**os.environ, **TEST_ENVIRONMENT},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # -X importtime lines look like "import time:  <self us> | <cumulative us> | <indented module name>"
+    self_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        self_times[name.strip()] = int(self_us)
+    probe["own_modules_seconds"] = sum(self_times.get(name, 0) for name in probe["own_modules"]) / 1_000_000
+    return probe
+
+
+def test_own_modules_import_within_budget():
+    probe = import_main_in_clean_process()
+
+    assert "main" in probe["own_modules"]
+    assert probe["own_modules_seconds"] < OWN_MODULES_IMPORT_BUDGET_SECONDS
+
+
+def test_import_main_builds_no_heavy_clients():
+    probe = import_main_in_clean_process()
+
+    assert probe["heavy_modules"] == []
+    assert not probe["fernet_built"]
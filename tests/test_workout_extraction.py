@@ -0,0 +1,51 @@
+import datetime
+
+import pytest
+
+from openai_utils import repair_workout_entry
+
+TODAY = datetime.date(2024, 6, 1)
+
+
+def test_valid_workout_is_returned_unchanged():
+    workout = repair_workout_entry({"date": "2024-05-30", "exercise": "Squat", "reps": 10}, TODAY)
+
+    assert workout.date == datetime.date(2024, 5, 30)
+    assert workout.reps == 10
+
+
+@pytest.mark.parametrize("raw_value, repaired", [
+    ("12 reps", 12),
+    (" 30 mins", 30),
+    (45.5, 45),
+    (-5, None),
+    ("-5", None),
+    (True, None),
+    (False, None),
+    ("a few", None),
+])
+def test_counts_are_repaired(raw_value, repaired):
+    workout = repair_workout_entry({"date": "2024-05-30", "exercise": "Squat", "reps": raw_value,
+                                    "duration": raw_value}, TODAY)
+
+    assert workout is not None
+    assert workout.exercise == "Squat"
+    assert workout.reps == repaired
+    assert workout.duration == repaired
+
+
+def test_invalid_date_falls_back_to_today():
+    workout = repair_workout_entry({"date": "yesterday", "exercise": "Squat", "reps": "8"}, TODAY)
+
+    assert workout.date == TODAY
+
+
+def test_datetime_is_truncated_to_date():
+    workout = repair_workout_entry({"date": "2024-05-30T18:30:00", "exercise": "Squat", "reps": "8 reps"}, TODAY)
+
+    assert workout.date == datetime.date(2024, 5, 30)
+
+
+@pytest.mark.parametrize("exercise", [None, "", "   "])
+def test_workout_without_exercise_is_dropped(exercise):
+    assert repair_workout_entry({"date": "2024-05-30", "exercise": exercise, "reps": 10}, TODAY) is None
@@ -1,10 +1,11 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from config import settings
+from config import get_settings
 
 
 def send_verification_email(to_email: str, code: str):
+    settings = get_settings()
     msg = MIMEMultipart()
     msg['From'] = settings.EMAIL_FROM
     msg['To'] = to_email
@@ -0,0 +1,18 @@
+import hashlib
+
+
+# version is the user's data_version from the users table, so every worker builds the same tag
+def build_etag(kind: str, email: str, version: int, *parts) -> str:
+    user_key = hashlib.sha256(email.encode()).hexdigest()[:16]
+    suffix = "".join(f"-{part}" for part in parts)
+    return f'"{kind}-{user_key}-{version}{suffix}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so a W/ prefix on the client's copy is ignored
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
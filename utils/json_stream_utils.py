@@ -0,0 +1,80 @@
+import json
+from typing import Optional
+
+
+# Incrementally pulls the objects out of a JSON array nested one level inside a top-level object,
+# e.g. each workout in {"workouts": [{...}, {...}]}, as soon as each one is closed. Text outside the
+# JSON document (such as a markdown fence around it) is ignored.
+class JsonArrayItemParser:
+
+    def __init__(self):
+        self._depth = 0
+        # A "{" seen before the document, which only starts it if a key follows
+        self._document_pending = False
+        self._in_string = False
+        self._escaped = False
+        self._item = []
+        # Offset into the current item just before its last complete key/value pair
+        self._last_complete_field = None
+
+    def feed(self, chunk: str) -> list:
+        items = []
+        for char in chunk:
+            if self._item:
+                self._item.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._document_pending:
+                if char.isspace():
+                    continue
+                self._document_pending = False
+                if char == '"':
+                    self._depth = 1
+
+            if char == '"':
+                # Quotes outside the document are prose, not JSON
+                if self._depth > 0:
+                    self._in_string = True
+            elif self._depth == 0:
+                # Only a "{" followed by a key can start the document; brackets in any prose before it are not counted
+                if char == "{":
+                    self._document_pending = True
+            elif char in "{[":
+                self._depth += 1
+                if char == "{" and self._depth == 3:
+                    self._item = [char]
+                    self._last_complete_field = None
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._depth == 2 and self._item:
+                    item = self._load("".join(self._item))
+                    if item is not None:
+                        items.append(item)
+                    self._item = []
+            elif char == "," and self._depth == 3 and self._item:
+                self._last_complete_field = len(self._item) - 1
+        return items
+
+    # Recovers the fields of an item cut off by the end of the stream, dropping its incomplete last field
+    def close(self) -> Optional[dict]:
+        if not self._item or self._last_complete_field is None:
+            return None
+        item = self._load("".join(self._item[:self._last_complete_field]) + "}")
+        self._item = []
+        return item
+
+    @staticmethod
+    def _load(text: str) -> Optional[dict]:
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return item if isinstance(item, dict) else None
@@ -1,17 +1,33 @@
-from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import HumanMessage, AIMessage
 from datetime import datetime, timedelta
-from config import settings
+from config import get_settings
 
-# Initialize LangChain memory with a size suitable for a 1-day session
-memory = ConversationBufferMemory(max_memory_size=10000)
+# langchain is slow to import, so the memory buffer and chat model are built on first use
+memory = None
 
 # Track the session start time
 session_start_time = datetime.utcnow()
 
-# Initialize ChatGPT model
-chat_model = ChatOpenAI(model_name="gpt-4", openai_api_key=settings.OPENAI_API_KEY)
+chat_model = None
+
+
+def get_memory():
+    global memory
+    if memory is None:
+        from langchain.memory import ConversationBufferMemory
+
+        # Initialize LangChain memory with a size suitable for a 1-day session
+        memory = ConversationBufferMemory(max_memory_size=10000)
+    return memory
+
+
+def get_chat_model():
+    global chat_model
+    if chat_model is None:
+        from langchain_openai import ChatOpenAI
+
+        # Initialize ChatGPT model
+        chat_model = ChatOpenAI(model_name="gpt-4", openai_api_key=get_settings().OPENAI_API_KEY)
+    return chat_model
 
 
 def is_session_expired():
@@ -23,17 +39,19 @@ def is_session_expired():
 def reset_session():
     global session_start_time, memory
     session_start_time = datetime.utcnow()
-    memory = ConversationBufferMemory(max_memory_size=10000)  # Reinitialize memory
+    memory = None  # Reinitialized on next use
 
 
 def add_message_to_memory(role, content):
     if role == "user":
-        memory.save_context({"input": content}, {"output": ""})
+        get_memory().save_context({"input": content}, {"output": ""})
     elif role == "assistant":
-        memory.save_context({"input": ""}, {"output": content})
+        get_memory().save_context({"input": ""}, {"output": content})
 
 
 async def generate_response(prompt, include_initial_context=False, initial_context=""):
+    from langchain.schema import HumanMessage
+
     if include_initial_context:
         full_prompt = f"{initial_context}\n\n{prompt}"
     else:
@@ -49,7 +67,7 @@ async def generate_response(prompt, include_initial_context=False, initial_conte
     # Debug print to inspect the message objects
     print("Converted message objects:", message_objects_wrapped)
 
-    response = await chat_model.agenerate(message_objects_wrapped)
+    response = await get_chat_model().agenerate(message_objects_wrapped)
 
     # Debug print to inspect the response
     print("Generated response:", response)
@@ -62,10 +80,14 @@ async def generate_response(prompt, include_initial_context=False, initial_conte
 
 def summarize_conversation():
     # Example summarization logic (customize as needed)
-    summary = memory.summarize()
+    summary = get_memory().summarize()
     return summary
 
 
+def get_buffer_length():
+    return len(get_memory().buffer)
+
+
 def get_initial_context(user_data, workout_history):
     user_personal_data = (
         f"User's personal data:\n"